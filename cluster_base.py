@@ -0,0 +1,203 @@
+import subprocess
+import sys
+import contextlib
+import json
+import os
+import re
+import selectors
+import shlex
+import shutil
+import time
+from functools import cached_property
+from pathlib import Path
+
+class ClusterBase:
+    """SSH transport, deployment and output streaming shared by the cluster managers"""
+    
+    def __init__(self):
+        self.nodes = ["n1", "n2", "n3"]
+        self.remote_base_dir = "/Users/0x53c/cluster_jobs"
+        self.venv_path = "/Users/0x53c/ray-cluster-venv"
+        self._dir_entries = None
+        self.last_result = None
+        
+        # Multiplex every ssh/scp call over one authenticated connection per node
+        os.makedirs(Path.home() / ".ssh", exist_ok=True)
+        self.ctl_path = str(Path.home() / ".ssh" / "cm-%r@%h:%p")
+        self.ssh_opts = [
+            "-o", "ControlMaster=auto",
+            "-o", f"ControlPath={self.ctl_path}",
+            "-o", "ControlPersist=10m",
+        ]
+        # Prefer rsync (delta + zstd) for redeploys; fall back to compressed scp.
+        # Non-interactive ssh finds the old /usr/bin/rsync first, so name the
+        # Homebrew one the remote PATH setup already relies on
+        self.has_rsync = self._rsync_supports_zstd()
+        self.remote_rsync = "/opt/homebrew/bin/rsync"
+        
+    @staticmethod
+    def _rsync_supports_zstd():
+        """True if the local rsync is 3.2+, the first with --compress-choice.
+        
+        macOS ships rsync 2.6.9 or openrsync as /usr/bin/rsync, so being on
+        PATH is not enough.
+        """
+        if shutil.which("rsync") is None:
+            return False
+        try:
+            banner = subprocess.run(["rsync", "--version"], capture_output=True, text=True, timeout=5).stdout
+        except (OSError, subprocess.TimeoutExpired):
+            return False
+        match = re.search(r"rsync\s+version\s+v?(\d+)\.(\d+)", banner)
+        return match is not None and (int(match[1]), int(match[2])) >= (3, 2)
+        
+    @cached_property
+    def git_repo_dir(self):
+        return Path.cwd()
+        
+    def _dir_index(self, refresh=False):
+        """Name -> DirEntry for the repo directory, from a single scandir pass"""
+        if refresh or self._dir_entries is None:
+            with os.scandir(self.git_repo_dir) as entries:
+                self._dir_entries = {entry.name: entry for entry in entries}
+        return self._dir_entries
+        
+    def _has_file(self, name):
+        # Index keys are str, so normalize Path arguments before the lookup
+        name = os.fspath(name)
+        if Path(name).name != name:
+            return (self.git_repo_dir / name).is_file()
+        # Rescan once on a miss so files created since the last scan are found
+        entry = self._dir_index().get(name) or self._dir_index(refresh=True).get(name)
+        return entry is not None and entry.is_file()
+        
+    def _ssh_argv(self, node, command, *ssh_args):
+        """Build an ssh argv that reuses the node's control connection"""
+        return ["ssh", *self.ssh_opts, *ssh_args, node, command]
+        
+    def _run_streaming(self, argv, log=None, timeout=None, heartbeat_s=None):
+        """Run a command, echoing stdout/stderr line by line as it arrives.
+        
+        Lines are also written to the open file log, if given. With
+        heartbeat_s set, the command is terminated once it has gone that long
+        without sending any bytes (a partial line counts), instead of waiting
+        out a fixed timeout.
+        """
+        # Unbuffered in case argv is a local python; remote commands set it
+        # themselves, since ssh does not forward the environment
+        env = {**os.environ, "PYTHONUNBUFFERED": "1"}
+        proc = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        last_output = time.monotonic()
+        stdout_lines, stderr_lines = [], []
+        # Read the raw fds: select() only sees the pipe, so a buffered
+        # readline() would strand lines it had already pulled in
+        sinks = {
+            proc.stdout.fileno(): (sys.stdout, stdout_lines, bytearray()),
+            proc.stderr.fileno(): (sys.stderr, stderr_lines, bytearray()),
+        }
+        
+        def emit(echo, lines, data):
+            text = data.decode(errors="replace")
+            echo.write(text)
+            echo.flush()
+            lines.append(text)
+            if log:
+                log.write(text)
+        
+        def flush_pending():
+            """Keep a partial last line from a process that is being killed"""
+            for echo, lines, pending in sinks.values():
+                if pending:
+                    emit(echo, lines, pending + b"\n")
+                    pending.clear()
+        
+        try:
+            with selectors.DefaultSelector() as selector:
+                for fd in sinks:
+                    selector.register(fd, selectors.EVENT_READ)
+                while selector.get_map():
+                    now = time.monotonic()
+                    if deadline is not None and now >= deadline:
+                        proc.kill()
+                        proc.wait()
+                        flush_pending()
+                        raise subprocess.TimeoutExpired(argv, timeout, "".join(stdout_lines), "".join(stderr_lines))
+                    if heartbeat_s is not None and now - last_output >= heartbeat_s:
+                        print(f"💔 No output for {heartbeat_s}s, terminating", file=sys.stderr)
+                        proc.terminate()
+                        try:
+                            proc.wait(timeout=5)
+                        except subprocess.TimeoutExpired:
+                            proc.kill()
+                        flush_pending()
+                        break
+                    
+                    wakeups = [t for t in (deadline, heartbeat_s and last_output + heartbeat_s) if t is not None]
+                    wait = min(wakeups) - now if wakeups else None
+                    for key, _ in selector.select(wait):
+                        echo, lines, pending = sinks[key.fd]
+                        data = os.read(key.fd, 65536)
+                        if not data:
+                            selector.unregister(key.fd)
+                            if pending:
+                                emit(echo, lines, pending)
+                                pending.clear()
+                            continue
+                        last_output = time.monotonic()
+                        pending += data
+                        end = pending.rfind(b"\n") + 1
+                        if end:
+                            emit(echo, lines, pending[:end])
+                            del pending[:end]
+            proc.wait()
+        finally:
+            proc.stdout.close()
+            proc.stderr.close()
+        
+        return subprocess.CompletedProcess(argv, proc.returncode, "".join(stdout_lines), "".join(stderr_lines))
+        
+    def _copy_one(self, node, src):
+        """Copy a single file to one node, sending only changed blocks when possible"""
+        dest = f"{node}:{self.remote_base_dir}/"
+        if self.has_rsync:
+            argv = [
+                "rsync", "-az", "--compress-choice=zstd", "--partial",
+                f"--rsync-path={self.remote_rsync}",
+                "-e", shlex.join(["ssh", *self.ssh_opts]),
+                str(src), dest
+            ]
+            result = subprocess.run(argv, capture_output=True, text=True)
+            # A node without Homebrew rsync fails here; retry over scp
+            if result.returncode == 0:
+                return result
+        argv = ["scp", "-C", *self.ssh_opts, str(src), dest]
+        return subprocess.run(argv, capture_output=True, text=True)
+
+def serve(cluster):
+    """Run jobs requested as JSON lines on stdin, replying with one JSON line each.
+    
+    Lets a caller (e.g. performance_comparator.py) keep one manager process
+    alive across many runs; job output goes to stderr while a job runs.
+    """
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        # A failing job (e.g. TimeoutExpired) is reported back rather than
+        # taking the worker down with it
+        try:
+            request = json.loads(line)
+            if request.get("cmd") != "run":
+                reply = {"ok": False, "error": f"unknown cmd: {request.get('cmd')}"}
+            else:
+                with contextlib.redirect_stdout(sys.stderr):
+                    ok = cluster.deploy_and_run(request["script"], request.get("job_name"))
+                result = cluster.last_result
+                reply = {
+                    "ok": ok,
+                    "stdout": result.stdout if result else "",
+                    "stderr": result.stderr if result else "",
+                }
+        except Exception as e:
+            reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        print(json.dumps(reply), flush=True)
@@ -1,45 +1,45 @@
-import subprocess
 import sys
-import os
 import time
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from cluster_base import ClusterBase, serve
 
-class MacMiniCluster:
+class MacMiniCluster(ClusterBase):
     def __init__(self):
-        self.nodes = ["n1", "n2", "n3"]
+        super().__init__()
         self.node_ips = ["192.168.183.173", "192.168.183.158", "192.168.183.122"]  # Original network IPs
-        self.remote_base_dir = "/Users/0x53c/cluster_jobs"
-        self.git_repo_dir = Path.cwd()
-        self.venv_path = "/Users/0x53c/ray-cluster-venv"
         
-    def deploy_and_run(self, script_name, job_name=None):
+    def deploy_and_run(self, script_name, job_name=None, heartbeat_s=120):
         if job_name is None:
             job_name = f"job_{int(time.time())}"
+        self.last_result = None
             
         local_script = self.git_repo_dir / script_name
-        if not local_script.exists():
+        if not self._has_file(script_name):
             print(f"❌ Script {script_name} not found in {self.git_repo_dir}")
             return False
         
         print(f"📤 Deploying {script_name} to cluster...")
         
-        # Deploy to all nodes
-        for node in self.nodes:
-            print(f"  📂 Deploying to {node}...")
-            result = subprocess.run([
-                "scp", str(local_script), 
-                f"{node}:{self.remote_base_dir}/"
-            ], capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                print(f"    ❌ Failed to deploy to {node}")
-                return False
+        # Deploy to all nodes in parallel
+        failed = False
+        with ThreadPoolExecutor(max_workers=len(self.nodes)) as executor:
+            futures = {executor.submit(self._copy_one, node, local_script): node for node in self.nodes}
+            for future in as_completed(futures):
+                node = futures[future]
+                if future.result().returncode != 0:
+                    print(f"    ❌ Failed to deploy to {node}")
+                    failed = True
+                else:
+                    print(f"  📂 Deployed to {node}")
+        if failed:
+            return False
         
         print(f"🚀 Running distributed job: {job_name}")
         
         host_list = ",".join(self.node_ips)
         cluster_command = f"""
         export PATH="/opt/homebrew/bin:/usr/local/bin:$PATH"
+        export PYTHONUNBUFFERED=1
         source {self.venv_path}/bin/activate
         cd {self.remote_base_dir}
         
@@ -49,31 +49,22 @@ class MacMiniCluster:
         echo ""
         
         # Run with the working configuration - use original IPs directly
-        /opt/homebrew/bin/mpirun -np 3 --host {host_list} --map-by :OVERSUBSCRIBE python3 {script_name}
+        /opt/homebrew/bin/mpirun -np 3 --host {host_list} --map-by :OVERSUBSCRIBE -x PYTHONUNBUFFERED python3 {script_name}
         """
         
-        result = subprocess.run([
-            "ssh", "n1", cluster_command
-        ], capture_output=True, text=True, timeout=300)
-        
-        print("📊 Job Output:")
-        print(result.stdout)
-        
-        if result.stderr:
-            print("⚠️  Errors:")
-            print(result.stderr)
-        
-        # Save results
+        # Save results as they stream in rather than after the job finishes
         results_file = self.git_repo_dir / f"{job_name}_results.txt"
-        with open(results_file, 'w') as f:
+        with open(results_file, 'w', buffering=1 << 20) as f:
             f.write(f"Job: {job_name}\n")
             f.write(f"Script: {script_name}\n")
             f.write(f"Timestamp: {time.ctime()}\n")
             f.write("-" * 50 + "\n")
-            f.write("STDOUT:\n")
-            f.write(result.stdout)
-            f.write("\nSTDERR:\n")
-            f.write(result.stderr)
+            
+            # Terminated on silence rather than a fixed 300s cap; the SSH
+            # baseline's largest all_sum can take a minute on the slow link
+            print("📊 Job Output:")
+            result = self._run_streaming(self._ssh_argv("n1", cluster_command), log=f, heartbeat_s=heartbeat_s)
+            self.last_result = result
         
         print(f"💾 Results saved to: {results_file}")
         
@@ -85,10 +76,15 @@ def main():
     if len(sys.argv) < 2:
         print("Mac Mini Cluster Manager")
         print("Usage: python3 cluster_manager.py <script_name> [job_name]")
+        print("       python3 cluster_manager.py --serve   (JSON job requests on stdin)")
         print("Example: python3 cluster_manager.py thunderbolt_vs_ssh_benchmark.py")
         print("Example: python3 cluster_manager.py cluster_test.py")
         return
     
+    if sys.argv[1] == "--serve":
+        serve(cluster)
+        return
+    
     script_name = sys.argv[1]
     job_name = sys.argv[2] if len(sys.argv) > 2 else None
     
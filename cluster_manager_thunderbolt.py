@@ -1,168 +1,330 @@
 import subprocess
 import sys
-import os
+import json
+import select
+import shlex
 import time
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from cluster_base import ClusterBase, serve
 
-class MacMiniClusterThunderboltOptimized:
+# Downloading or loading a model can go minutes without printing anything
+MODEL_LOAD_HEARTBEAT_S = 300
+
+class MacMiniClusterThunderboltOptimized(ClusterBase):
     
     def __init__(self):
-        self.nodes = ["n1", "n2", "n3"]
+        super().__init__()
         self.ssh_ips = ["192.168.183.173", "192.168.183.158", "192.168.183.122"]
         self.thunderbolt_ips = ["169.254.1.1", "169.254.1.2", "169.254.1.3"]
-        self.remote_base_dir = "/Users/0x53c/cluster_jobs"
-        self.git_repo_dir = Path.cwd()
-        self.venv_path = "/Users/0x53c/ray-cluster-venv"
+        
+        # Default macOS socket buffers are far below the Thunderbolt bridge's
+        # bandwidth-delay product; applied once per node by tune_nodes()
+        self._tcp_tuning = (
+            "sudo -n sysctl -w net.inet.tcp.sendspace=4194304 "
+            "net.inet.tcp.recvspace=4194304 net.inet.tcp.delayed_ack=0 >/dev/null 2>&1"
+        )
+        self.nodes_tuned = False
+        
+        # Shared by every remote command: built once instead of per call.
+        # Remote python writes into a pipe and would block-buffer its stdout,
+        # hiding output from the streaming echo and the heartbeat
+        self._preamble = (
+            'export PATH="/opt/homebrew/bin:/usr/local/bin:$PATH"\n'
+            "export PYTHONUNBUFFERED=1\n"
+            f"source {self.venv_path}/bin/activate\n"
+            f"cd {self.remote_base_dir}\n"
+        )
+        # SSH IPs for launching, Thunderbolt subnet forced for all MPI data
+        self._all_ranks = f"-np {len(self.ssh_ips)} -H {','.join(self.ssh_ips)}"
+        self._single_rank = f"-np 1 -H {self.ssh_ips[0]}"
+        self._mpi_flags = [
+            "--map-by", ":OVERSUBSCRIBE",
+            "--mca", "btl_tcp_if_include", "169.254.1.0/24",
+            "--mca", "pml", "ob1",
+            # Shared memory for co-located (oversubscribed) ranks, TCP between nodes
+            "--mca", "btl", "vader,tcp,self",
+            "--mca", "orte_base_help_aggregate", "0",
+            "--mca", "btl_tcp_sndbuf", "4194304",
+            "--mca", "btl_tcp_rcvbuf", "4194304",
+            "--mca", "btl_tcp_eager_limit", "65536",
+            "--mca", "btl_tcp_links", "2",
+            # Keep TCP progressing while a rank is busy in Python between collectives
+            "--mca", "btl_tcp_progress_thread", "1",
+            "--mca", "mpi_yield_when_idle", "0",
+            # Pass the preamble's unbuffered stdout on to every rank
+            "-x", "PYTHONUNBUFFERED",
+        ]
+        # Spawn the remote daemons concurrently rather than one ssh at a time
+        # (launch-only, so not needed for prun against a running DVM)
+        self._mpirun = (
+            "/opt/homebrew/bin/mpirun --prtemca plm_rsh_num_concurrent 32 " + " ".join(self._mpi_flags)
+        )
+        
+        # Persistent PRTE DVM on n1: pays the daemon bootstrap once, after which
+        # prun launches ranks without a fresh ssh fan-out (see start_dvm)
+        self.dvm_hostfile = "/Users/0x53c/hosts"
+        self.dvm_uri_file = "/tmp/prte.uri"
+        self.dvm_pid_file = "/tmp/prte.pid"
+        self.dvm_running = False
+        self._prun = (
+            f"/opt/homebrew/bin/prun --dvm-uri file:{self.dvm_uri_file} " + " ".join(self._mpi_flags)
+        )
+        
+        # Long-lived inference worker on n1 (see run_mlx_inference)
+        self._worker_proc = None
+        self._worker_model = None
         
     def deploy_script(self, script_name):
         """Deploy script via SSH management network"""
         local_script = self.git_repo_dir / script_name
-        if not local_script.exists():
+        if not self._has_file(script_name):
             print(f"❌ Script {script_name} not found")
             return False
         
         print(f"📂 Deploying {script_name} via SSH...")
-        for node in self.nodes:
-            result = subprocess.run([
-                "scp", str(local_script), f"{node}:{self.remote_base_dir}/"
-            ], capture_output=True, text=True)
-            if result.returncode != 0:
-                print(f"❌ Failed to deploy to {node}")
+        failed = False
+        with ThreadPoolExecutor(max_workers=len(self.nodes)) as executor:
+            futures = {executor.submit(self._copy_one, node, local_script): node for node in self.nodes}
+            for future in as_completed(futures):
+                if future.result().returncode != 0:
+                    print(f"❌ Failed to deploy to {futures[future]}")
+                    failed = True
+        if failed:
+            return False
+        print("✅ Deployment complete")
+        return True
+        
+    def deploy_files(self, paths):
+        """Deploy many files in one tar stream per node"""
+        rel_paths = []
+        for path in paths:
+            local_path = (self.git_repo_dir / path).resolve()
+            try:
+                # tar runs from the repo dir, so every file must live under it
+                rel_path = local_path.relative_to(self.git_repo_dir.resolve())
+            except ValueError:
+                rel_path = None
+            if rel_path is None or not self._has_file(path):
+                print(f"❌ File {path} not found in {self.git_repo_dir}")
                 return False
+            rel_paths.append(str(rel_path))
+        
+        print(f"📦 Deploying {len(rel_paths)} files via SSH...")
+        failed = False
+        with ThreadPoolExecutor(max_workers=len(self.nodes)) as executor:
+            futures = {executor.submit(self._tar_one, node, rel_paths): node for node in self.nodes}
+            for future in as_completed(futures):
+                returncode, error = future.result()
+                if returncode != 0:
+                    print(f"❌ Failed to deploy to {futures[future]}: {error or f'exit {returncode}'}")
+                    failed = True
+        if failed:
+            return False
         print("✅ Deployment complete")
         return True
         
-    def run_optimized_thunderbolt_job(self, script_name, job_name):
+    def tune_nodes(self):
+        """Apply the TCP tuning on every node (best effort, needs passwordless sudo)"""
+        print("🔧 Tuning TCP buffers on all nodes...")
+        with ThreadPoolExecutor(max_workers=len(self.nodes)) as executor:
+            futures = {
+                executor.submit(subprocess.run, self._ssh_argv(node, self._tcp_tuning), capture_output=True, timeout=30): node
+                for node in self.nodes
+            }
+            for future in as_completed(futures):
+                try:
+                    tuned = future.result().returncode == 0
+                except subprocess.TimeoutExpired:
+                    tuned = False
+                if not tuned:
+                    print(f"⚠️  TCP tuning skipped on {futures[future]} (needs passwordless sudo)")
+        # sysctl settings last until reboot, so once per manager is enough
+        self.nodes_tuned = True
+        
+    def _mpi_command(self, worker_command, *extra_flags, single_rank=False):
+        """mpirun (or prun, once the DVM is up) line for worker_command"""
+        # Every rank's endpoint needs the tuning, not just n1 where mpirun runs
+        if not self.nodes_tuned:
+            self.tune_nodes()
+        launcher = self._prun if self.dvm_running else self._mpirun
+        placement = self._single_rank if single_rank else self._all_ranks
+        return " ".join([launcher, placement, *extra_flags, "python3", worker_command])
+        
+    def start_dvm(self):
+        """Start the PRTE DVM on n1 unless one is already running"""
+        hosts = "\\n".join(self.ssh_ips)
+        dvm_command = self._preamble + f"""
+        if [ -f {self.dvm_pid_file} ] && kill -0 "$(cat {self.dvm_pid_file})" 2>/dev/null; then
+            echo "♻️  PRTE DVM already running"
+        else
+            printf '{hosts}\\n' > {self.dvm_hostfile}
+            rm -f {self.dvm_uri_file}
+            prte --daemonize --hostfile {self.dvm_hostfile} \\
+                --report-uri {self.dvm_uri_file} --report-pid {self.dvm_pid_file} || exit 1
+            echo "🚀 PRTE DVM started"
+        fi
+        """
+        result = self._run_streaming(self._ssh_argv("n1", dvm_command), heartbeat_s=30)
+        self.dvm_running = result.returncode == 0
+        if not self.dvm_running:
+            print("❌ Failed to start PRTE DVM, falling back to mpirun")
+        return self.dvm_running
+        
+    def stop_dvm(self):
+        """Tear down the PRTE DVM on n1"""
+        dvm_command = self._preamble + f"""
+        pterm --dvm-uri file:{self.dvm_uri_file}
+        rm -f {self.dvm_uri_file} {self.dvm_pid_file}
+        """
+        result = self._run_streaming(self._ssh_argv("n1", dvm_command), heartbeat_s=30)
+        self.dvm_running = False
+        return result.returncode == 0
+        
+    def _tar_one(self, node, rel_paths):
+        """Pipe a local tar archive into tar on one node; returns (returncode, remote stderr)"""
+        tar = subprocess.Popen(
+            ["tar", "-C", str(self.git_repo_dir), "-cz", "--", *rel_paths],
+            stdout=subprocess.PIPE
+        )
+        untar = subprocess.Popen(
+            self._ssh_argv(node, f"tar -C {self.remote_base_dir} -xz"),
+            stdin=tar.stdout, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+        tar.stdout.close()  # let tar see SIGPIPE if ssh exits early
+        _, untar_err = untar.communicate()
+        tar.wait()
+        return untar.returncode or tar.returncode, untar_err.decode(errors="replace").strip()
+        
+    def run_optimized_thunderbolt_job(self, script_name, job_name, heartbeat_s=30, log=None):
         """Run MPI with SSH process management + Thunderbolt data transfer"""
         print(f"⚡ OPTIMIZED Thunderbolt job: {job_name}")
         print("🚀 Architecture: SSH process launch + Thunderbolt data transfer")
         
         # The magic: SSH hostnames for process management, 
         # Thunderbolt network forced for all MPI data traffic
-        cluster_command = f"""
-        export PATH="/opt/homebrew/bin:/usr/local/bin:$PATH"
-        source {self.venv_path}/bin/activate
-        cd {self.remote_base_dir}
-        
+        cluster_command = self._preamble + f"""
         echo "⚡ THUNDERBOLT OPTIMIZED Environment: $(hostname)"
         echo "🔧 Process Management: SSH (reliable)"
         echo "📊 Data Transfer: Thunderbolt Bridge (high-performance)"
-        echo "🌐 Thunderbolt IPs: 169.254.1.1, 169.254.1.2, 169.254.1.3"
+        echo "🌐 Thunderbolt IPs: {', '.join(self.thunderbolt_ips)}"
         echo ""
         
-        # Key optimization: Use SSH IPs for launching, force Thunderbolt for data
-        /opt/homebrew/bin/mpirun \\
-            -np 3 \\
-            -H 192.168.183.173,192.168.183.158,192.168.183.122 \\
-            --map-by :OVERSUBSCRIBE \\
-            --mca btl_tcp_if_include 169.254.1.0/24 \\
-            --mca pml ob1 \\
-            --mca btl tcp,self \\
-            --mca orte_base_help_aggregate 0 \\
-            python3 {script_name}
+        {self._mpi_command(script_name)}
         """
         
-        result = subprocess.run([
-            "ssh", "n1", cluster_command
-        ], capture_output=True, text=True, timeout=600)
+        result = self._run_streaming(self._ssh_argv("n1", cluster_command), log=log, heartbeat_s=heartbeat_s)
         
         return result
         
-    def deploy_and_run(self, script_name, job_name=None):
+    def deploy_and_run(self, script_name, job_name=None, heartbeat_s=30):
         if job_name is None:
             job_name = f"thunderbolt_optimized_{int(time.time())}"
+        self.last_result = None
             
         if not self.deploy_script(script_name):
             return False
             
-        result = self.run_optimized_thunderbolt_job(script_name, job_name)
-        
-        print("📊 OPTIMIZED Thunderbolt Output:")
-        print(result.stdout)
-        
-        if result.stderr:
-            print("⚠️  Errors/Info:")
-            print(result.stderr)
-        
-        # Save results
+        # Save results as they stream in rather than after the job finishes
         results_file = self.git_repo_dir / f"{job_name}_results.txt"
-        with open(results_file, 'w') as f:
+        with open(results_file, 'w', buffering=1 << 20) as f:
             f.write(f"Job: {job_name}\n")
             f.write(f"Architecture: SSH process launch + Thunderbolt data\n")
             f.write(f"Performance: Thunderbolt Bridge optimized\n")
             f.write(f"Timestamp: {time.ctime()}\n")
             f.write("-" * 50 + "\n")
-            f.write(result.stdout)
-            if result.stderr:
-                f.write("\nSTDERR:\n")
-                f.write(result.stderr)
+            
+            print("📊 OPTIMIZED Thunderbolt Output:")
+            result = self.run_optimized_thunderbolt_job(script_name, job_name, heartbeat_s, log=f)
+            self.last_result = result
         
         print(f"💾 Results: {results_file}")
         return result.returncode == 0
 
-    def run_mlx_inference(self, prompt, model_name="llama3.2:latest"):
+    def _inference_worker(self, model_name):
+        """Return a running --serve worker for model_name, starting one if needed"""
+        proc = self._worker_proc
+        if proc is not None and proc.poll() is None and self._worker_model == model_name:
+            return proc
+        self.stop_inference_worker()
+        
+        print(f"🚀 Starting MLX inference worker for {model_name}...")
+        serve_command = self._preamble + (
+            f"exec python3 mlx_inference_worker.py --serve --model {shlex.quote(model_name)}\n"
+        )
+        self._worker_proc = subprocess.Popen(
+            self._ssh_argv("n1", serve_command),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=1, text=True
+        )
+        self._worker_model = model_name
+        return self._worker_proc
+        
+    def stop_inference_worker(self):
+        """Shut down the long-lived inference worker, if any"""
+        proc, self._worker_proc, self._worker_model = self._worker_proc, None, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            proc.kill()
+            proc.wait()
+        
+    def run_mlx_inference(self, prompt, model_name="llama3.2:latest", max_tokens=500, system_prompt=None, timeout=300):
+        """Run inference on a worker that keeps the model loaded between prompts"""
         print(f"🧠 MLX Inference: {model_name}")
         print(f"💬 Prompt: {prompt[:50]}...")
-        escaped_prompt = prompt.replace('"', '\\"').replace('$', '\\$')
-        
-        inference_command = f"""
-        export PATH="/opt/homebrew/bin:/usr/local/bin:$PATH"
-        source {self.venv_path}/bin/activate
-        cd {self.remote_base_dir}
-        
-        echo "🧠 MLX Inference on Thunderbolt cluster"
-        /opt/homebrew/bin/mpirun \\
-            -np 3 \\
-            -H {','.join(self.ssh_ips)} \\
-            --map-by :OVERSUBSCRIBE \\
-            --mca btl_tcp_if_include 169.254.1.0/24 \\
-            --mca pml ob1 \\
-            --mca btl tcp,self \\
-            --mca orte_base_help_aggregate 0 \\
-            --allow-run-as-root \\
-            python3 mlx_inference_worker.py --prompt "{escaped_prompt}" --model {model_name}
-        """
         
-        result = subprocess.run([
-            "ssh", "n1", inference_command
-        ], capture_output=True, text=True, timeout=1800)
+        proc = self._inference_worker(model_name)
+        try:
+            request = {"prompt": prompt, "max_tokens": max_tokens}
+            if system_prompt:
+                request["system"] = system_prompt
+            proc.stdin.write(json.dumps(request) + "\n")
+            proc.stdin.flush()
+            # Exactly one reply line per request, so nothing can sit in the
+            # read buffer unseen by select(); the deadline covers a wedged worker
+            ready, _, _ = select.select([proc.stdout], [], [], timeout)
+            line = proc.stdout.readline() if ready else None
+        except OSError as e:
+            line = ""
+            print(f"⚠️  Inference worker pipe error: {e}")
+        
+        if line is None:
+            print(f"❌ MLX inference timed out after {timeout}s, stopping worker")
+            proc.kill()  # wedged, so don't wait for it to notice stdin closing
+            self.stop_inference_worker()
+            return None
         
-        if result.returncode == 0:
-            return result.stdout.strip()
-        else:
-            print(f"❌ MLX inference failed: {result.stderr}")
+        if not line:
+            print("❌ MLX inference failed: worker exited")
+            self.stop_inference_worker()
             return None
         
-    def run_mlx_chat(self, prompt, model_name="mlx-community/Llama-3.2-3B-Instruct-4bit", system_prompt=None):
+        reply = json.loads(line)
+        if "error" in reply:
+            print(f"❌ MLX inference failed: {reply['error']}")
+            return None
+        return reply["r"]
+        
+    def run_mlx_chat(self, prompt, model_name="mlx-community/Llama-3.2-3B-Instruct-4bit", system_prompt=None, heartbeat_s=MODEL_LOAD_HEARTBEAT_S):
         """Run MLX chat inference with proper argument handling"""
         print(f"🧠 MLX Chat: {model_name}")
         print(f"💬 Prompt: {prompt[:50]}...")
         
-        # Escape special characters
-        escaped_prompt = prompt.replace('"', '\\"').replace('$', '\\$').replace('`', '\\`')
-        system_arg = f'--system "{system_prompt}"' if system_prompt else ""
-        
-        chat_command = f"""
-        export PATH="/opt/homebrew/bin:/usr/local/bin:$PATH"
-        source {self.venv_path}/bin/activate
-        cd {self.remote_base_dir}
+        # Quote for the remote shell in a single pass
+        quoted_prompt = shlex.quote(prompt)
+        system_arg = f"--system {shlex.quote(system_prompt)}" if system_prompt else ""
         
+        # Single rank: generation is not sharded, so extra ranks would only
+        # load the same model and answer the same prompt again
+        worker = f'mlx_chat_worker.py --prompt {quoted_prompt} --model {shlex.quote(model_name)} {system_arg}'
+        chat_command = self._preamble + f"""
         echo "🧠 MLX Chat on Thunderbolt cluster"
-        /opt/homebrew/bin/mpirun \\
-            -np 3 \\
-            -H {','.join(self.ssh_ips)} \\
-            --map-by :OVERSUBSCRIBE \\
-            --mca btl_tcp_if_include 169.254.1.0/24 \\
-            --mca pml ob1 \\
-            --mca btl tcp,self \\
-            --mca orte_base_help_aggregate 0 \\
-            --allow-run-as-root \\
-            python3 mlx_chat_worker.py --prompt "{escaped_prompt}" --model {model_name} {system_arg}
+        {self._mpi_command(worker, "--allow-run-as-root", single_rank=True)}
         """
         
-        result = subprocess.run([
-            "ssh", "n1", chat_command
-        ], capture_output=True, text=True, timeout=300)
+        result = self._run_streaming(self._ssh_argv("n1", chat_command), heartbeat_s=heartbeat_s)
         
         if result.returncode == 0:
             # Extract the response from the output
@@ -176,30 +338,23 @@ class MacMiniClusterThunderboltOptimized:
             print(f"❌ MLX chat failed: {result.stderr}")
             return None
         
-    def run_simple_chat(self, prompt, use_mock=False):
+    def run_simple_chat(self, prompt, use_mock=False, heartbeat_s=MODEL_LOAD_HEARTBEAT_S):
         """Run simple chat without distributed complexity"""
         print(f"🧠 Simple Chat Test")
         print(f"💬 Prompt: {prompt[:50]}...")
         
-        escaped_prompt = prompt.replace('"', '\\"').replace('$', '\\$').replace('`', '\\`')
+        quoted_prompt = shlex.quote(prompt)
         mock_flag = "--mock" if use_mock else ""
         
-        chat_command = f"""
-        export PATH="/opt/homebrew/bin:/usr/local/bin:$PATH"
-        source {self.venv_path}/bin/activate
-        cd {self.remote_base_dir}
-        
+        chat_command = self._preamble + f"""
         echo "🧠 Simple Chat Test"
-        python3 simple_chat_worker.py --prompt "{escaped_prompt}" {mock_flag}
+        python3 simple_chat_worker.py --prompt {quoted_prompt} {mock_flag}
         """
         
-        result = subprocess.run([
-            "ssh", "n1", chat_command
-        ], capture_output=True, text=True, timeout=60)
+        result = self._run_streaming(self._ssh_argv("n1", chat_command), heartbeat_s=heartbeat_s)
         
         if result.returncode == 0:
             print("✅ Simple chat successful!")
-            print(result.stdout)
             return result.stdout
         else:
             print(f"❌ Simple chat failed: {result.stderr}")
@@ -211,15 +366,16 @@ class MacMiniClusterThunderboltOptimized:
         for i, (node, ip) in enumerate(zip(self.nodes, self.ssh_ips)):
             print(f"Testing {node} ({ip})...")
             
-            result = subprocess.run([
-                "ssh", "-o", "ConnectTimeout=5", node, "echo 'SSH OK'; hostname; uptime"
-            ], capture_output=True, text=True, timeout=10)
+            result = subprocess.run(
+                self._ssh_argv(node, "echo 'SSH OK'; hostname; uptime", "-o", "ConnectTimeout=5"),
+                capture_output=True, text=True, timeout=10
+            )
             
             if result.returncode == 0:
                 print(f"✅ {node}: {result.stdout.strip()}")
             else:
                 print(f"❌ {node}: {result.stderr.strip()}")
-    def run_script_with_args(self, script_name, script_args=None, job_name=None):
+    def run_script_with_args(self, script_name, script_args=None, job_name=None, heartbeat_s=30):
         """Run script with arguments on the cluster"""
         if job_name is None:
             job_name = f"script_{int(time.time())}"
@@ -229,11 +385,7 @@ class MacMiniClusterThunderboltOptimized:
         # Build the script command with arguments
         args_str = f" {script_args}" if script_args else ""
         
-        cluster_command = f"""
-        export PATH="/opt/homebrew/bin:/usr/local/bin:$PATH"
-        source {self.venv_path}/bin/activate
-        cd {self.remote_base_dir}
-        
+        cluster_command = self._preamble + f"""
         echo "🚀 Running script: {script_name}"
         echo "📝 Arguments: {script_args or 'none'}"
         
@@ -241,13 +393,11 @@ class MacMiniClusterThunderboltOptimized:
         python3 {script_name}{args_str}
         """
         
-        result = subprocess.run([
-            "ssh", "n1", cluster_command
-        ], capture_output=True, text=True, timeout=300)
+        result = self._run_streaming(self._ssh_argv("n1", cluster_command), heartbeat_s=heartbeat_s)
         
         return result
 
-    def run_distributed_script_with_args(self, script_name, script_args=None, job_name=None):   
+    def run_distributed_script_with_args(self, script_name, script_args=None, job_name=None, heartbeat_s=30):
         """Run script with arguments across all nodes"""
         if job_name is None:
             job_name = f"distributed_{int(time.time())}"
@@ -256,28 +406,30 @@ class MacMiniClusterThunderboltOptimized:
         
         args_str = f" {script_args}" if script_args else ""
         
-        cluster_command = f"""
-        export PATH="/opt/homebrew/bin:/usr/local/bin:$PATH"
-        source {self.venv_path}/bin/activate
-        cd {self.remote_base_dir}
-        
+        cluster_command = self._preamble + f"""
         echo "⚡ DISTRIBUTED: {script_name}"
         echo "📝 Arguments: {script_args or 'none'}"
         
-        /opt/homebrew/bin/mpirun \\
-            -np 3 \\
-            -H {','.join(self.ssh_ips)} \\
-            --map-by :OVERSUBSCRIBE \\
-            --mca btl_tcp_if_include 169.254.1.0/24 \\
-            --mca pml ob1 \\
-            --mca btl tcp,self \\
-            --mca orte_base_help_aggregate 0 \\
-            python3 {script_name}{args_str}
+        {self._mpi_command(script_name + args_str)}
         """
         
-        result = subprocess.run([
-            "ssh", "n1", cluster_command
-        ], capture_output=True, text=True, timeout=300)
+        result = self._run_streaming(self._ssh_argv("n1", cluster_command), heartbeat_s=heartbeat_s)
+        
+        return result
+
+    def run_distributed_chat(self, prompt, model_name="mlx-community/TinyLlama-1.1B-Chat-v1.0-4bit", heartbeat_s=MODEL_LOAD_HEARTBEAT_S):
+        print(f"🌐 Distributed Chat: {model_name}")
+        print(f"💬 Prompt: {prompt[:50]}...")
+        
+        quoted_prompt = shlex.quote(prompt)
+        
+        worker = f'distributed_chat_worker.py --prompt {quoted_prompt} --model {shlex.quote(model_name)}'
+        distributed_command = self._preamble + f"""
+        echo "🌐 Distributed Chat Inference"
+        {self._mpi_command(worker)}
+        """
+        
+        result = self._run_streaming(self._ssh_argv("n1", distributed_command), heartbeat_s=heartbeat_s)
         
         return result
 
@@ -292,8 +444,13 @@ def main():
         print("  python3 cluster_manager_thunderbolt.py <script>")
         print("  python3 cluster_manager_thunderbolt.py <script> --args 'script arguments'")
         print("  python3 cluster_manager_thunderbolt.py <script> --distributed --args 'script arguments'")
+        print("  python3 cluster_manager_thunderbolt.py <script> --with 'helper.py other.py'")
+        print("  python3 cluster_manager_thunderbolt.py <script> --distributed --dvm")
+        print("  python3 cluster_manager_thunderbolt.py dvm-start|dvm-stop")
+        print("  python3 cluster_manager_thunderbolt.py tune")
         print("  python3 cluster_manager_thunderbolt.py chat \"your message\"")
         print("  python3 cluster_manager_thunderbolt.py debug")
+        print("  python3 cluster_manager_thunderbolt.py --serve   (JSON job requests on stdin)")
         print("")
         print("Examples:")
         print("  python3 cluster_manager_thunderbolt.py simple_chat_worker.py --args '--test-mlx'")
@@ -313,76 +470,70 @@ def main():
         print(f"💬 Chat: {message}")
         return
     
+    if script_name == "--serve":
+        serve(cluster)
+        return
+    
     if script_name == "debug":
         cluster.debug_ssh_connection()
         return
     
+    if script_name == "tune":
+        cluster.tune_nodes()
+        return
+    
+    if script_name == "dvm-start":
+        cluster.start_dvm()
+        return
+    
+    if script_name == "dvm-stop":
+        cluster.stop_dvm()
+        return
+    
     # Parse arguments
     distributed = False
+    use_dvm = False
     script_args = None
+    extra_files = []
     
     i = 2
     while i < len(sys.argv):
         if sys.argv[i] == "--distributed":
             distributed = True
+        elif sys.argv[i] == "--dvm":
+            use_dvm = True
         elif sys.argv[i] == "--args" and i + 1 < len(sys.argv):
             script_args = sys.argv[i + 1]
             i += 1
+        elif sys.argv[i] == "--with" and i + 1 < len(sys.argv):
+            extra_files = sys.argv[i + 1].split()
+            i += 1
         i += 1
     
-    # Deploy the script
-    if not cluster.deploy_script(script_name):
+    # Deploy the script (and any helper files in the same tar stream)
+    if extra_files:
+        deployed = cluster.deploy_files([script_name] + extra_files)
+    else:
+        deployed = cluster.deploy_script(script_name)
+    if not deployed:
         print("❌ Failed to deploy script")
         return
     
-    # Run the script
+    # Launch through the persistent DVM (started on first use, then reused)
+    if use_dvm:
+        cluster.start_dvm()
+    
+    # Run the script (output is streamed as it arrives)
+    print("📊 Output:")
     if distributed:
         result = cluster.run_distributed_script_with_args(script_name, script_args)
     else:
         result = cluster.run_script_with_args(script_name, script_args)
     
-    print("📊 Output:")
-    print(result.stdout)
-    
-    if result.stderr:
-        print("⚠️  Errors/Info:")
-        print(result.stderr)
-    
     if result.returncode == 0:
         print("✅ Script completed successfully!")
     else:
         print("❌ Script failed")
-    
-    def run_distributed_chat(self, prompt, model_name="mlx-community/TinyLlama-1.1B-Chat-v1.0-4bit"):
-        print(f"🌐 Distributed Chat: {model_name}")
-        print(f"💬 Prompt: {prompt[:50]}...")
-        
-        escaped_prompt = prompt.replace('"', '\\"').replace('$', '\\$').replace('`', '\\`')
-        
-        distributed_command = f"""
-        export PATH="/opt/homebrew/bin:/usr/local/bin:$PATH"
-        source {self.venv_path}/bin/activate
-        cd {self.remote_base_dir}
-        
-        echo "🌐 Distributed Chat Inference"
-        /opt/homebrew/bin/mpirun \\
-            -np 3 \\
-            -H {','.join(self.ssh_ips)} \\
-            --map-by :OVERSUBSCRIBE \\
-            --mca btl_tcp_if_include 169.254.1.0/24 \\
-            --mca pml ob1 \\
-            --mca btl tcp,self \\
-            --mca orte_base_help_aggregate 0 \\
-            python3 distributed_chat_worker.py --prompt "{escaped_prompt}" --model {model_name}
-        """
-        
-        result = subprocess.run([
-            "ssh", "n1", distributed_command
-        ], capture_output=True, text=True, timeout=300)
-        
-        return result
-
-
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,7 @@
-import mlx.core as mx
 import socket
 import os
+import statistics
+import time
 
 def debug_mpi_setup():
     
@@ -16,6 +17,10 @@ def debug_mpi_setup():
     print("\n🚀 Initializing MLX distributed...")
     
     try:
+        # Imported here so the environment report above prints even when MLX
+        # is broken, without paying the MLX/Metal load first
+        import mlx.core as mx
+        
         mx.set_default_device(mx.cpu)
         world = mx.distributed.init()
         rank = world.rank()
@@ -35,6 +40,25 @@ def debug_mpi_setup():
         result = mx.distributed.all_sum(test_data)
         print(f"  Test all_sum result: {result}")
         
+        # Sweep message sizes across the BTL eager/rendezvous thresholds so the
+        # MCA tuning can actually be observed; first iteration is warmup
+        if rank == 0:
+            print(f"\n📊 all_sum latency sweep (median of 9, float32)")
+        for num_elements in [256, 16_384, 262_144, 4_194_304]:
+            buf = mx.zeros((num_elements,), dtype=mx.float32)
+            mx.eval(buf)
+            timings = []
+            for _ in range(10):
+                t0 = time.perf_counter()
+                result = mx.distributed.all_sum(buf)
+                mx.eval(result)
+                timings.append(time.perf_counter() - t0)
+            
+            if rank == 0:
+                size_kib = num_elements * 4 / 1024
+                median_s = statistics.median(timings[1:])
+                print(f"  {size_kib:>8.0f} KiB: {median_s * 1e3:8.3f} ms - {size_kib / 1024 / median_s:8.1f} MB/s")
+        
     except Exception as e:
         print(f"❌ MLX distributed init failed: {e}")
 
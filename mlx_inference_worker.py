@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import argparse
+import json
 import sys
 import os
 from pathlib import Path
@@ -7,31 +8,100 @@ from pathlib import Path
 # Add MLX to path if needed
 sys.path.append('/opt/homebrew/lib/python3.11/site-packages')
 
+# Chat template token ids around the user turn, keyed by system prompt
+_TEMPLATE_IDS = {}
+_USER_SLOT = "\x00USER\x00"
+
+def _template_ids(tokenizer, system_prompt):
+    """Tokenize the fixed parts of the chat template once per system prompt"""
+    cached = _TEMPLATE_IDS.get(system_prompt)
+    if cached is None:
+        messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+        messages.append({"role": "user", "content": _USER_SLOT})
+        rendered = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        prefix, suffix = rendered.split(_USER_SLOT)
+        cached = (
+            tokenizer.encode(prefix, add_special_tokens=False),
+            tokenizer.encode(suffix, add_special_tokens=False),
+        )
+        _TEMPLATE_IDS[system_prompt] = cached
+    return cached
+
+def encode_prompt(tokenizer, prompt, system_prompt=None):
+    """Token ids for prompt, encoding only the user text on each call"""
+    if getattr(tokenizer, "chat_template", None) is None:
+        return tokenizer.encode(prompt)
+    prefix_ids, suffix_ids = _template_ids(tokenizer, system_prompt)
+    return prefix_ids + tokenizer.encode(prompt, add_special_tokens=False) + suffix_ids
+
+def serve(model, tokenizer, default_max_tokens, default_system=None):
+    """Answer newline-delimited JSON requests on stdin with the already-loaded model"""
+    from mlx_lm import generate
+    
+    # Warm the template cache before the first request arrives
+    if getattr(tokenizer, "chat_template", None) is not None:
+        _template_ids(tokenizer, default_system)
+    
+    print(f"✅ MLX Worker ready on {os.uname().nodename}", file=sys.stderr, flush=True)
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+            response = generate(
+                model,
+                tokenizer,
+                prompt=encode_prompt(tokenizer, request["prompt"], request.get("system", default_system)),
+                max_tokens=request.get("max_tokens", default_max_tokens),
+                verbose=False
+            )
+            reply = {"r": response}
+        except Exception as e:
+            reply = {"error": str(e)}
+        print(json.dumps(reply), flush=True)
+
 def main():
     parser = argparse.ArgumentParser(description='MLX Inference Worker')
-    parser.add_argument('--prompt', required=True, help='Input prompt')
+    parser.add_argument('--prompt', help='Input prompt')
     parser.add_argument('--model', required=True, help='Model name')
     parser.add_argument('--max-tokens', type=int, default=500, help='Max tokens')
+    parser.add_argument('--system', help='System prompt')
+    parser.add_argument('--serve', action='store_true', help='Keep the model loaded and read JSON prompts from stdin')
     args = parser.parse_args()
     
+    # Generation is not sharded across ranks; if launched under mpirun with
+    # several ranks, only rank 0 loads the model and answers
+    if int(os.environ.get('OMPI_COMM_WORLD_RANK', '0')) != 0:
+        sys.exit(0)
+    
+    if not args.serve and not args.prompt:
+        parser.error('--prompt is required unless --serve is given')
+    
+    # In serve mode stdout carries the JSON protocol, so status goes to stderr
+    status = sys.stderr if args.serve else sys.stdout
+    
     try:
         # Import MLX (only when actually running)
         import mlx.core as mx
         from mlx_lm import load, generate
         
-        print(f"🧠 MLX Worker starting on {os.uname().nodename}")
-        print(f"📝 Loading model: {args.model}")
+        print(f"🧠 MLX Worker starting on {os.uname().nodename}", file=status)
+        print(f"📝 Loading model: {args.model}", file=status)
         
         # Load model - DON'T add mlx-community/ prefix since it's already included
         model, tokenizer = load(args.model)  # Use args.model directly
         
+        if args.serve:
+            serve(model, tokenizer, args.max_tokens, args.system)
+            return
+        
         print(f"💭 Generating response for: {args.prompt[:50]}...")
         
         # Generate response
         response = generate(
             model, 
             tokenizer, 
-            prompt=args.prompt, 
+            prompt=encode_prompt(tokenizer, args.prompt, args.system), 
             max_tokens=args.max_tokens,
             verbose=False
         )
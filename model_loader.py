@@ -1,10 +1,25 @@
 import mlx.core as mx
 import mlx.nn as nn
+from mlx.utils import tree_flatten
 from mlx_lm import load
+from math import prod
 import socket
 import json
 import argparse
 import os
+import subprocess
+import threading
+
+# Loaded (model, tokenizer) pairs keyed by (model path, lazy), shared by every test
+_MODEL_CACHE = {}
+
+def get_model(path, lazy=False):
+    """Load a model once per process and reuse it afterwards"""
+    key = (path, lazy)
+    cached = _MODEL_CACHE.get(key)
+    if cached is None:
+        cached = _MODEL_CACHE[key] = load(path, lazy=lazy)
+    return cached
 
 class DistributedModelManager:
     def __init__(self, model_path="mlx-community/TinyLlama-1.1B-Chat-v1.0-4bit"):
@@ -13,6 +28,10 @@ class DistributedModelManager:
         self.rank = None
         self.size = None
         self.hostname = socket.gethostname()
+        # Rank i runs on node_hosts[i] (same order as the mpirun -H list)
+        self.node_hosts = ["192.168.183.173", "192.168.183.158", "192.168.183.122"]
+        self.thunderbolt_hosts = ["169.254.1.1", "169.254.1.2", "169.254.1.3"]
+        self._warm_ok = True
         
     def initialize_distributed(self):
         """Initialize distributed MLX"""
@@ -27,6 +46,43 @@ class DistributedModelManager:
             print(f"❌ Distributed init failed: {e}")
             return False
     
+    def barrier(self):
+        """Block until every rank gets here (MLX has no dedicated barrier)"""
+        # MPI collectives only run on the CPU stream
+        mx.eval(mx.distributed.all_sum(mx.array(1.0), stream=mx.cpu))
+    
+    def _hub_model_dir(self):
+        hub_dir = os.path.expanduser("~/.cache/huggingface/hub")
+        return os.path.join(hub_dir, "models--" + self.model_path.replace("/", "--"))
+    
+    def _warm_peer_caches(self):
+        """Push rank 0's downloaded model into every peer's HF cache"""
+        model_dir = self._hub_model_dir()
+        if not os.path.isdir(model_dir):
+            self._warm_ok = True
+            return True  # local path or non-hub model, nothing to share
+        
+        # Push over the same subnet MPI was told to use, if it's Thunderbolt
+        tcp_if = os.environ.get('OMPI_MCA_btl_tcp_if_include', '')
+        hosts = self.thunderbolt_hosts if "169.254.1" in tcp_if else self.node_hosts
+        peers = [host for i, host in enumerate(hosts[:self.size]) if i != self.rank]
+        print(f"📤 Rank 0 syncing {os.path.basename(model_dir)} to {len(peers)} peers...")
+        try:
+            procs = [
+                subprocess.Popen([
+                    "rsync", "-a",
+                    "--rsync-path", "mkdir -p ~/.cache/huggingface/hub && rsync",
+                    model_dir, f"{peer}:.cache/huggingface/hub/"
+                ])
+                for peer in peers
+            ]
+        except OSError as e:
+            print(f"❌ Cache sync could not start: {e}")
+            self._warm_ok = False
+            return False
+        self._warm_ok = all(proc.wait() == 0 for proc in procs)
+        return self._warm_ok
+    
     def inspect_model_structure(self, model):
         """Inspect MLX model structure"""
         try:
@@ -43,32 +99,25 @@ class DistributedModelManager:
                         print(f"  ... and {len(modules) - 5} more modules")
                         break
             
-            # Check model attributes
+            # Only the attributes worth reporting; walking dir(model) fires
+            # every property, some of which traverse all parameters
             print(f"📋 Model attributes:")
-            for attr in dir(model):
-                if not attr.startswith('_') and not callable(getattr(model, attr)):
-                    try:
-                        value = getattr(model, attr)
-                        print(f"  {attr}: {type(value).__name__}")
-                    except:
-                        print(f"  {attr}: <inaccessible>")
+            for attr in ('layers', 'args', 'config', 'model_type', 'vocab_size'):
+                if hasattr(model, attr):
+                    print(f"  {attr}: {type(getattr(model, attr)).__name__}")
             
             # Try to get model parameters
             if hasattr(model, 'parameters'):
-                params = model.parameters()
+                # parameters() is a nested tree; flatten to (dotted name, array)
+                params = [(name, param) for name, param in tree_flatten(model.parameters()) if hasattr(param, 'shape')]
                 print(f"📊 Model has {len(params)} parameters")
                 
-                total_params = 0
-                for name, param in params.items():
-                    if hasattr(param, 'shape'):
-                        param_count = 1
-                        for dim in param.shape:
-                            param_count *= dim
-                        total_params += param_count
-                        
-                        if len(name) < 50:  # Show shorter names
-                            print(f"  {name}: {param.shape}")
+                for name, param in params[:5]:  # Show first 5 parameters
+                    print(f"  {name}: {param.shape}")
+                if len(params) > 5:
+                    print(f"  ... and {len(params) - 5} more parameters")
                 
+                total_params = sum(prod(param.shape) for _, param in params)
                 print(f"📊 Total parameters: {total_params:,}")
             
             return True
@@ -85,26 +134,32 @@ class DistributedModelManager:
             if self.rank == 0:
                 print(f"📥 Rank 0 downloading model: {self.model_path}")
                 # Only rank 0 downloads the model
-                model, tokenizer = load(self.model_path)
+                model, tokenizer = get_model(self.model_path)
                 print(f"✅ Model downloaded and loaded on rank 0")
                 
-                # Inspect the model structure
+                # Pre-warm peer caches (so they never hit the hub themselves)
+                # in the background while the model structure is inspected
+                # Assume failure until the sync reports back, in case the thread dies
+                self._warm_ok = False
+                warm_thread = threading.Thread(target=self._warm_peer_caches, daemon=True)
+                warm_thread.start()
                 self.inspect_model_structure(model)
+                warm_thread.join()
+                if not self._warm_ok:
+                    print("⚠️ Cache sync failed, peers will fall back to downloading")
                 
             else:
                 print(f"⏳ Rank {self.rank} waiting for model distribution...")
                 model, tokenizer = None, None
             
-            # Synchronize all ranks
-            mx.distributed.barrier()
+            # Synchronize all ranks: peer caches are warm past this point
+            self.barrier()
             
-            if self.rank == 0:
-                print("🔄 Broadcasting model info to other ranks...")
-            
-            # Non-rank-0 nodes load from cache (much faster)
+            # Non-rank-0 nodes load from the warmed cache; lazy=True defers
+            # materializing weights until first use
             if self.rank != 0:
                 print(f"📦 Rank {self.rank} loading from cache...")
-                model, tokenizer = load(self.model_path)
+                model, tokenizer = get_model(self.model_path, lazy=True)
                 print(f"✅ Rank {self.rank} loaded from cache")
             
             return model, tokenizer
@@ -168,7 +223,7 @@ def test_distributed_loading():
         
         # Test simple distributed operation
         test_input = mx.array([float(manager.rank + 1)])
-        result = mx.distributed.all_sum(test_input)
+        result = mx.distributed.all_sum(test_input, stream=mx.cpu)
         print(f"🔗 Rank {manager.rank} distributed test: {result}")
         
         if manager.rank == 0:
@@ -189,9 +244,7 @@ def test_distributed_loading():
 def test_model_info():
     try:
         print("🔍 Can this model be extracted?...")
-        from mlx_lm import load
-        
-        model, tokenizer = load("mlx-community/TinyLlama-1.1B-Chat-v1.0-4bit")
+        model, tokenizer = get_model("mlx-community/TinyLlama-1.1B-Chat-v1.0-4bit")
         
         print(f"✅ Model loaded successfully")
         print(f"📊 Model type: {type(model).__name__}")
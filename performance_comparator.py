@@ -1,33 +1,106 @@
+import argparse
 import subprocess
 import re
+import select
 import time
 import statistics
 import json
 from datetime import datetime
 
+# Backstop for a whole benchmark job; stalls are caught sooner by the
+# managers' own output heartbeat
+JOB_TIMEOUT_S = 900
+
+# One alternation per metric line, scanned over the whole output in a single pass:
+#   "Node X: 10000x10000 fp32 (381.5MB) - 2.345s - 487.2 MB/s" (untagged = fp32)
+#   "Node X: SSH Final - 12.3 ops/s - 1234.5 MB/s"
+#   "Node X: SSH message storm - 1234 ops/s"
+BENCHMARK_METRICS_RE = re.compile(
+    r'(?P<dim>\d+)x(?P=dim)(?:[ \t]+(?P<dtype>fp32|bf16))?.*?(?P<bandwidth>\d+\.\d+)[ \t]*MB/s'
+    r'|(?:SSH|Thunderbolt) Final.*?(?P<ops>\d+\.\d+) ops/s.*?(?P<throughput>\d+\.\d+) MB/s'
+    r'|(?:SSH|Thunderbolt) message storm.*?(?P<storm>\d+) ops/s'
+)
+
 class PerformanceComparator:
     def __init__(self):
         self.ssh_results = []
         self.thunderbolt_results = []
+        # Last calculate_improvements() result, reused by save_results()
+        self._improvements = None
+        
+        # One long-lived "--serve" manager process per cluster manager script
+        self._workers = {}
+        
+    def _worker(self, cluster_manager):
+        proc = self._workers.get(cluster_manager)
+        if proc is None or proc.poll() is not None:
+            proc = subprocess.Popen(
+                ['python3', cluster_manager, '--serve'],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+                bufsize=1
+            )
+            self._workers[cluster_manager] = proc
+        return proc
+    
+    def _request_run(self, cluster_manager, benchmark_script, timeout=JOB_TIMEOUT_S):
+        """Ask the manager worker to run one job; None if the worker is gone"""
+        proc = self._worker(cluster_manager)
+        try:
+            proc.stdin.write(json.dumps({"cmd": "run", "script": benchmark_script}) + "\n")
+            proc.stdin.flush()
+            ready, _, _ = select.select([proc.stdout], [], [], timeout)
+            if not ready:
+                proc.kill()
+                proc.wait()
+                del self._workers[cluster_manager]
+                raise subprocess.TimeoutExpired(proc.args, timeout)
+            line = proc.stdout.readline()
+        except OSError:
+            line = ""
+        
+        if not line:
+            self._workers.pop(cluster_manager, None)
+            return None
+        return json.loads(line)
+    
+    def close_workers(self):
+        for proc in self._workers.values():
+            try:
+                proc.stdin.close()
+                proc.wait(timeout=10)
+            except (OSError, subprocess.TimeoutExpired):
+                proc.kill()
+                proc.wait()
+        self._workers.clear()
         
     def run_benchmark(self, cluster_manager, benchmark_script, network_type):
         print(f"\n🚀 Running {network_type} benchmark...")
         print(f"Command: python3 {cluster_manager} {benchmark_script}")
         
         try:
-            result = subprocess.run(
-                ['python3', cluster_manager, benchmark_script],
-                capture_output=True,
-                text=True,
-                timeout=300
-            )
+            reply = self._request_run(cluster_manager, benchmark_script)
+            if reply is None:
+                # Worker died; replay the request through a one-off "--serve"
+                # process so the job takes the same launch path as the worker
+                print(f"⚠️  {network_type} worker unavailable, spawning {cluster_manager} directly")
+                result = subprocess.run(
+                    ['python3', cluster_manager, '--serve'],
+                    input=json.dumps({"cmd": "run", "script": benchmark_script}) + "\n",
+                    capture_output=True,
+                    text=True,
+                    timeout=JOB_TIMEOUT_S
+                )
+                replies = result.stdout.splitlines()
+                reply = json.loads(replies[-1]) if replies else {"ok": False, "stderr": result.stderr}
             
-            if result.returncode != 0:
+            if not reply["ok"]:
                 print(f"❌ {network_type} benchmark failed:")
-                print(f"STDERR: {result.stderr}")
+                print(f"STDERR: {reply.get('stderr') or reply.get('error')}")
                 return None
                 
-            output = result.stdout
+            output = reply["stdout"]
             print(f"✅ {network_type} benchmark completed")
             
             # Parse the output for performance metrics
@@ -47,115 +120,65 @@ class PerformanceComparator:
             'network_type': network_type,
             'timestamp': datetime.now().isoformat(),
             'large_transfer_bandwidth': [],
+            'large_transfer_bandwidth_bf16': [],
             'sustained_ops_rate': None,
             'sustained_throughput': None,
             'message_storm_rate': None
         }
         
-        lines = output.split('\n')
-        
-        for line in lines:
-            # Parse large data transfer results
-            # Format: "Node X: 10000x10000 (381.5MB) - 2.345s - 487.2 MB/s"
-            large_transfer_match = re.search(r'(\d+)x\1.*?(\d+\.\d+)\s*MB/s', line)
-            if large_transfer_match:
-                bandwidth = float(large_transfer_match.group(2))
-                metrics['large_transfer_bandwidth'].append(bandwidth)
-            
-            # Parse sustained operations final results
-            # Format: "Node X: SSH Final - 12.3 ops/s - 1234.5 MB/s"
-            sustained_match = re.search(r'(SSH|Thunderbolt) Final.*?(\d+\.\d+) ops/s.*?(\d+\.\d+) MB/s', line)
-            if sustained_match:
-                metrics['sustained_ops_rate'] = float(sustained_match.group(2))
-                metrics['sustained_throughput'] = float(sustained_match.group(3))
-            
-            # Parse message storm results
-            # Format: "Node X: SSH message storm - 1234 ops/s"
-            storm_match = re.search(r'(SSH|Thunderbolt) message storm.*?(\d+) ops/s', line)
-            if storm_match:
-                metrics['message_storm_rate'] = float(storm_match.group(2))
+        for match in BENCHMARK_METRICS_RE.finditer(output):
+            if match['bandwidth'] is not None:
+                # fp32 and bf16 stay separate so the dtypes can be compared
+                key = 'large_transfer_bandwidth_bf16' if match['dtype'] == 'bf16' else 'large_transfer_bandwidth'
+                metrics[key].append(float(match['bandwidth']))
+            elif match['ops'] is not None:
+                metrics['sustained_ops_rate'] = float(match['ops'])
+                metrics['sustained_throughput'] = float(match['throughput'])
+            else:
+                metrics['message_storm_rate'] = float(match['storm'])
         
         return metrics
     
+    def _aggregate(self, runs):
+        """Average every metric over runs in a single traversal (0 if no data)"""
+        sums = {
+            'large_transfer_bandwidth': 0.0,
+            'large_transfer_bandwidth_bf16': 0.0,
+            'sustained_ops_rate': 0.0,
+            'sustained_throughput': 0.0,
+            'message_storm_rate': 0.0
+        }
+        counts = dict.fromkeys(sums, 0)
+        
+        for run in runs:
+            for metric in ('large_transfer_bandwidth', 'large_transfer_bandwidth_bf16'):
+                for bandwidth in run[metric]:
+                    sums[metric] += bandwidth
+                    counts[metric] += 1
+            for metric in ('sustained_ops_rate', 'sustained_throughput', 'message_storm_rate'):
+                if run[metric] is not None:
+                    sums[metric] += run[metric]
+                    counts[metric] += 1
+        
+        return {metric: sums[metric] / counts[metric] if counts[metric] else 0 for metric in sums}
+    
     def calculate_improvements(self):
         """Calculate performance improvements from SSH to Thunderbolt"""
         if not self.ssh_results or not self.thunderbolt_results:
             print("❌ Missing benchmark results for comparison")
             return None
         
-        improvements = {}
-        
-        # Compare large transfer bandwidth
-        ssh_bandwidth = statistics.mean([
-            bw for run in self.ssh_results 
-            for bw in run['large_transfer_bandwidth']
-        ]) if any(run['large_transfer_bandwidth'] for run in self.ssh_results) else 0
+        ssh_avg = self._aggregate(self.ssh_results)
+        tb_avg = self._aggregate(self.thunderbolt_results)
         
-        tb_bandwidth = statistics.mean([
-            bw for run in self.thunderbolt_results 
-            for bw in run['large_transfer_bandwidth']
-        ]) if any(run['large_transfer_bandwidth'] for run in self.thunderbolt_results) else 0
-        
-        if ssh_bandwidth > 0:
-            improvements['large_transfer_bandwidth'] = {
-                'ssh_avg': ssh_bandwidth,
-                'thunderbolt_avg': tb_bandwidth,
-                'improvement_percent': ((tb_bandwidth - ssh_bandwidth) / ssh_bandwidth) * 100
-            }
-        
-        # Compare sustained operations
-        ssh_ops = statistics.mean([
-            run['sustained_ops_rate'] for run in self.ssh_results 
-            if run['sustained_ops_rate'] is not None
-        ]) if any(run['sustained_ops_rate'] for run in self.ssh_results) else 0
-        
-        tb_ops = statistics.mean([
-            run['sustained_ops_rate'] for run in self.thunderbolt_results 
-            if run['sustained_ops_rate'] is not None
-        ]) if any(run['sustained_ops_rate'] for run in self.thunderbolt_results) else 0
-        
-        if ssh_ops > 0:
-            improvements['sustained_ops_rate'] = {
-                'ssh_avg': ssh_ops,
-                'thunderbolt_avg': tb_ops,
-                'improvement_percent': ((tb_ops - ssh_ops) / ssh_ops) * 100
-            }
-        
-        # Compare sustained throughput
-        ssh_throughput = statistics.mean([
-            run['sustained_throughput'] for run in self.ssh_results 
-            if run['sustained_throughput'] is not None
-        ]) if any(run['sustained_throughput'] for run in self.ssh_results) else 0
-        
-        tb_throughput = statistics.mean([
-            run['sustained_throughput'] for run in self.thunderbolt_results 
-            if run['sustained_throughput'] is not None
-        ]) if any(run['sustained_throughput'] for run in self.thunderbolt_results) else 0
-        
-        if ssh_throughput > 0:
-            improvements['sustained_throughput'] = {
-                'ssh_avg': ssh_throughput,
-                'thunderbolt_avg': tb_throughput,
-                'improvement_percent': ((tb_throughput - ssh_throughput) / ssh_throughput) * 100
-            }
-        
-        # Compare message storm rate
-        ssh_storm = statistics.mean([
-            run['message_storm_rate'] for run in self.ssh_results 
-            if run['message_storm_rate'] is not None
-        ]) if any(run['message_storm_rate'] for run in self.ssh_results) else 0
-        
-        tb_storm = statistics.mean([
-            run['message_storm_rate'] for run in self.thunderbolt_results 
-            if run['message_storm_rate'] is not None
-        ]) if any(run['message_storm_rate'] for run in self.thunderbolt_results) else 0
-        
-        if ssh_storm > 0:
-            improvements['message_storm_rate'] = {
-                'ssh_avg': ssh_storm,
-                'thunderbolt_avg': tb_storm,
-                'improvement_percent': ((tb_storm - ssh_storm) / ssh_storm) * 100
-            }
+        improvements = {}
+        for metric in ssh_avg:
+            if ssh_avg[metric] > 0:
+                improvements[metric] = {
+                    'ssh_avg': ssh_avg[metric],
+                    'thunderbolt_avg': tb_avg[metric],
+                    'improvement_percent': ((tb_avg[metric] - ssh_avg[metric]) / ssh_avg[metric]) * 100
+                }
         
         return improvements
     
@@ -212,7 +235,7 @@ class PerformanceComparator:
             'timestamp': datetime.now().isoformat(),
             'ssh_results': self.ssh_results,
             'thunderbolt_results': self.thunderbolt_results,
-            'improvements': self.calculate_improvements()
+            'improvements': self._improvements if self._improvements is not None else self.calculate_improvements()
         }
         
         with open(filename, 'w') as f:
@@ -220,11 +243,24 @@ class PerformanceComparator:
         
         print(f"💾 Results saved to {filename}")
     
-    def run_comparison(self, num_runs=3):
+    def run_comparison(self, num_runs=3, save=True):
         """Run complete comparison with multiple runs for accuracy"""
         print(f"🎯 Starting SSH vs Thunderbolt Performance Comparison")
         print(f"🔄 Running {num_runs} iterations of each benchmark")
         
+        try:
+            self._run_all(num_runs)
+        finally:
+            self.close_workers()
+        
+        # Calculate and display results
+        improvements = self.calculate_improvements()
+        self._improvements = improvements
+        self.print_comparison_report(improvements)
+        if save:
+            self.save_results()
+    
+    def _run_all(self, num_runs):
         # Run SSH benchmarks
         for i in range(num_runs):
             print(f"\n📡 SSH Benchmark Run {i+1}/{num_runs}")
@@ -248,26 +284,18 @@ class PerformanceComparator:
             if result:
                 self.thunderbolt_results.append(result)
             time.sleep(5)  # Brief pause between runs
-        
-        # Calculate and display results
-        improvements = self.calculate_improvements()
-        self.print_comparison_report(improvements)
-        self.save_results()
 
 def main():
+    parser = argparse.ArgumentParser(description="Compare SSH and Thunderbolt MLX distributed benchmarks")
+    parser.add_argument("--runs", type=int, default=3, help="Benchmark runs per network type (default 3)")
+    parser.add_argument("--no-save", action="store_true", help="Don't write performance_comparison.json")
+    args = parser.parse_args()
+    
     print("🚀 MLX Distributed Performance Comparator")
     print("This script will run SSH and Thunderbolt benchmarks and calculate differences")
     
-    # Allow user to choose number of runs
-    try:
-        num_runs = int(input("\nEnter number of benchmark runs per network type (default 3): ") or "3")
-        if num_runs < 1:
-            num_runs = 1
-    except ValueError:
-        num_runs = 3
-    
     comparator = PerformanceComparator()
-    comparator.run_comparison(num_runs)
+    comparator.run_comparison(max(args.runs, 1), save=not args.no_save)
 
 if __name__ == "__main__":
     main()
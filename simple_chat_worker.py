@@ -4,14 +4,28 @@
 import socket
 import argparse
 
+MODEL_PATH = "mlx-community/Llama-3.2-1B-Instruct-4bit"
+
+# Loaded (model, tokenizer) pairs, so several tests in one run share a load
+_MODEL_CACHE = {}
+
+def get_model(path=MODEL_PATH):
+    """Load a model once per process and reuse it afterwards"""
+    cached = _MODEL_CACHE.get(path)
+    if cached is None:
+        from mlx_lm import load
+        
+        print("🧠 Loading model...")
+        cached = _MODEL_CACHE[path] = load(path)
+        print("✅ Model loaded!")
+    return cached
+
 def test_basic_generation():
     """Test basic generation with minimal parameters"""
     try:
-        from mlx_lm import load, generate
+        from mlx_lm import generate
         
-        print("🧠 Loading model...")
-        model, tokenizer = load("mlx-community/Llama-3.2-1B-Instruct-4bit")
-        print("✅ Model loaded!")
+        model, tokenizer = get_model()
         
         # Test with minimal parameters
         prompt = "Hello, how are you?"
@@ -32,11 +46,9 @@ def test_basic_generation():
 def test_with_max_tokens():
     """Test generation with max_tokens parameter"""
     try:
-        from mlx_lm import load, generate
+        from mlx_lm import generate
         
-        print("🧠 Loading model...")
-        model, tokenizer = load("mlx-community/Llama-3.2-1B-Instruct-4bit")
-        print("✅ Model loaded!")
+        model, tokenizer = get_model()
         
         prompt = "Hello, how are you?"
         print(f"🤖 Testing with max_tokens...")
@@ -61,16 +73,16 @@ def main():
     
     print(f"🖥️  Minimal Chat Worker on: {socket.gethostname()}")
     
+    # Flags combine; every requested step reuses the same loaded model
     if args.test_basic:
         test_basic_generation()
-    elif args.test_max_tokens:
+    if args.test_max_tokens:
         test_with_max_tokens()
-    elif args.prompt:
+    if args.prompt:
         try:
-            from mlx_lm import load, generate
+            from mlx_lm import generate
             
-            print("🧠 Loading model...")
-            model, tokenizer = load("mlx-community/Llama-3.2-1B-Instruct-4bit")
+            model, tokenizer = get_model()
             
             print(f"🤖 Generating response for: '{args.prompt}'")
             response = generate(model, tokenizer, prompt=args.prompt, max_tokens=100)
@@ -78,7 +90,7 @@ def main():
             print(f"🎯 Response: {response}")
         except Exception as e:
             print(f"❌ Failed: {e}")
-    else:
+    if not (args.test_basic or args.test_max_tokens or args.prompt):
         print("Use --test-basic, --test-max-tokens, or --prompt 'your message'")
 
 if __name__ == "__main__":